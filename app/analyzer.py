@@ -5,7 +5,11 @@ Analisador definitivo de demandas de TI do AvivaHub.
 Arquitetura: Regras explícitas + IA assistida (LangChain).
 """
 
-from typing import List, Set
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Set, Tuple
+
+from opentelemetry.trace import Span
 
 from app.schemas import (
     DemandInput,
@@ -19,13 +23,49 @@ from app.catalog import (
     get_default_roles_for_category
 )
 
-from app.llm import run_llm_analysis
+from app.llm import run_llm_analysis, run_llm_delta_analysis
+from app.logging_config import record_stage
+from app.tracing import tracer
+
+
+# ---------------------------------------------------------
+# INSTRUMENTAÇÃO DAS ETAPAS
+# ---------------------------------------------------------
+
+@contextmanager
+def _stage(name: str) -> Iterator[Span]:
+    """
+    Abre o span da etapa e registra seu tempo no contexto de log da requisição.
+    """
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(f"analyzer.{name}") as span:
+            yield span
+    finally:
+        record_stage(name, (time.perf_counter() - start) * 1000)
 
 
 # ---------------------------------------------------------
 # REGRAS DE NEGÓCIO (GUARDRAILS)
 # ---------------------------------------------------------
 
+def categorize_demand(demand: DemandInput) -> Set[str]:
+    """
+    Categorias por regras (palavras-chave + categoria informada).
+    Sem span nem registro de etapa: seguro fora da requisição (shadow).
+    """
+
+    categories = set(suggest_categories_from_text(demand.texto_demanda))
+
+    if demand.categoria:
+        categories.add(demand.categoria)
+
+    if not categories:
+        categories.add("produto_digital")
+
+    return categories
+
+
 def _estimate_effort(categories: Set[str]) -> EffortEstimate:
     """
     Estima esforço de forma orientativa.
@@ -104,39 +144,91 @@ class DemandAnalyzer:
     - IA melhora entendimento, linguagem e contexto
     """
 
+    def classify(self, demand: DemandInput) -> Set[str]:
+        """
+        Classificação inicial por regras (palavras-chave + categoria informada).
+        """
+
+        with _stage("classify") as span:
+            categories = categorize_demand(demand)
+            span.set_attribute("analyzer.categories", sorted(categories))
+
+        return categories
+
+    def understand(self, demand: DemandInput, categories: Set[str]) -> Dict:
+        """
+        Chamada IA (apenas para entendimento semântico).
+        """
+
+        with _stage("llm_analysis"):
+            return run_llm_analysis(
+                cliente=demand.cliente,
+                texto_demanda=demand.texto_demanda,
+                categorias=list(categories),
+                restricoes=demand.restricoes or []
+            )
+
+    def understand_delta(
+        self,
+        demand: DemandInput,
+        categories: Set[str],
+        previous_result: Dict,
+        changes: str
+    ) -> Dict:
+        """
+        Chamada IA incremental: atualiza o resultado anterior a partir do diff do texto.
+        """
+
+        with _stage("llm_delta_analysis"):
+            return run_llm_delta_analysis(
+                analise_anterior=previous_result,
+                alteracoes=changes,
+                categorias=list(categories),
+                restricoes=demand.restricoes or []
+            )
+
+    def apply_rules(self, categories: Set[str]) -> Tuple[List[TeamRole], EffortEstimate]:
+        """
+        Construção de time e esforço (sistema decide).
+        """
+
+        with _stage("rules"):
+            return _build_team(categories), _estimate_effort(categories)
+
+    def build_output(
+        self,
+        llm_result: Dict,
+        team: List[TeamRole],
+        effort: EffortEstimate
+    ) -> DemandAnalysisOutput:
+        """
+        Montagem do output final (contrato fechado).
+        """
+
+        with _stage("build_output"):
+            return DemandAnalysisOutput(
+                resumo_executivo=llm_result["resumo_executivo"],
+                objetivo_do_cliente=llm_result["objetivo_do_cliente"],
+                principais_dores=llm_result["principais_dores"],
+                tecnologias_mencionadas=llm_result.get("tecnologias_mencionadas", []),
+                proposta_de_time=team,
+                estimativa_esforco=effort,
+                confianca_geral=llm_result.get("confianca_geral", 0.85)
+            )
+
     def analyze(self, demand: DemandInput) -> DemandAnalysisOutput:
         """
         Executa análise completa de demanda com apoio de IA.
         """
 
         # 1️⃣ Classificação inicial por regras
-        categories = set(suggest_categories_from_text(demand.texto_demanda))
-
-        if demand.categoria:
-            categories.add(demand.categoria)
-
-        if not categories:
-            categories.add("produto_digital")
+        categories = self.classify(demand)
 
         # 2️⃣ Chamada IA (apenas para entendimento semântico)
-        llm_result = run_llm_analysis(
-            cliente=demand.cliente,
-            texto_demanda=demand.texto_demanda,
-            categorias=list(categories),
-            restricoes=demand.restricoes or []
-        )
+        llm_result = self.understand(demand, categories)
 
         # 3️⃣ Construção de time e esforço (sistema decide)
-        team = _build_team(categories)
-        effort = _estimate_effort(categories)
+        team, effort = self.apply_rules(categories)
 
         # 4️⃣ Montagem do output final (contrato fechado)
-        return DemandAnalysisOutput(
-            resumo_executivo=llm_result["resumo_executivo"],
-            objetivo_do_cliente=llm_result["objetivo_do_cliente"],
-            principais_dores=llm_result["principais_dores"],
-            tecnologias_mencionadas=llm_result.get("tecnologias_mencionadas", []),
-            proposta_de_time=team,
-            estimativa_esforco=effort,
-            confianca_geral=llm_result.get("confianca_geral", 0.85)
-        )
+        return self.build_output(llm_result, team, effort)
@@ -6,6 +6,8 @@ Centraliza configurações do AvivaHub Demand Analyzer.
 Usa pydantic-settings (compatível com Pydantic v2).
 """
 
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,12 +18,57 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str
+    # Endpoint compatível com a API da OpenAI (gateway, stub de load test)
+    OPENAI_BASE_URL: Optional[str] = None
 
     # LLM
     LLM_MODEL: str = "gpt-4o-mini"
     LLM_TEMPERATURE: float = 0.2
     LLM_TIMEOUT_SECONDS: int = 20
     LLM_MAX_RETRIES: int = 2
+    LLM_STREAMING: bool = False
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    # Fração dos logs INFO mantida (WARNING ou acima sempre são mantidos)
+    LOG_INFO_SAMPLE_RATE: float = 1.0
+
+    # Monitor de lag do event loop (GET /metrics/event-loop)
+    EVENT_LOOP_MONITOR_ENABLED: bool = True
+    EVENT_LOOP_MONITOR_INTERVAL_MS: int = 50
+
+    # Sessões de re-análise (WebSocket): similaridade mínima entre a versão
+    # anterior e a nova do texto para usar o prompt delta em vez do completo
+    SESSION_DELTA_MIN_SIMILARITY: float = 0.8
+
+    # Shadow traffic: modelos candidatos avaliados em segundo plano
+    # (env como JSON, ex: SHADOW_MODELS='["gpt-4.1-nano"]')
+    SHADOW_MODELS: List[str] = []
+    # Fração das requisições de /analyze-demand reenviadas aos candidatos
+    SHADOW_SAMPLE_RATE: float = 0.0
+    SHADOW_MAX_WORKERS: int = 2
+    # Acima disso novas amostras são descartadas (protege o processo)
+    SHADOW_MAX_PENDING: int = 50
+    SHADOW_MAX_RECORDS: int = 1000
+    # JSONL opcional com todos os registros (agrega vários workers)
+    SHADOW_RESULTS_PATH: Optional[str] = None
+
+    # Profiling por requisição (desligado por padrão)
+    PROFILING_ENABLED: bool = False
+    # Token do header x-profile que força o profiling de uma requisição
+    PROFILING_TOKEN: Optional[str] = None
+    # Fração de requisições profiladas automaticamente (0 a 1)
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_DIR: str = "profiles"
+    # Retenção: só os N profiles mais recentes ficam em disco
+    PROFILING_MAX_FILES: int = 200
+
+    # Tracing (OpenTelemetry)
+    # none | console | file | otlp | "modulo:fabrica" (exporter customizado)
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "avivahub-demand-analyzer"
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -10,8 +10,13 @@ Responsabilidade única:
 - Retornar JSON estruturado e validado
 """
 
-from typing import Dict, List
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
 
+import httpx
+from langchain_core.messages import AIMessage
 from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import ChatPromptTemplate
@@ -19,7 +24,11 @@ from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from app.config import settings
-from app.prompt import SYSTEM_PROMPT, USER_PROMPT
+from app.logging_config import annotate_request
+from app.prompt import DELTA_USER_PROMPT, SYSTEM_PROMPT, USER_PROMPT
+from app.tracing import TracingTransport, tracer
+
+logger = logging.getLogger("avivahub-demand-analyzer.llm")
 
 
 # ---------------------------------------------------------
@@ -66,27 +75,180 @@ class LLMAnalysisResult(BaseModel):
 # CLIENTE LLM
 # ---------------------------------------------------------
 
-def _build_llm() -> ChatOpenAI:
+# Cliente HTTP compartilhado: reaproveita conexões e cria um span
+# por tentativa (inclusive retries), propagando o trace-context.
+# Limites iguais aos padrões do SDK da OpenAI; ficam no transport
+# porque o httpx ignora limits= quando um transport é informado.
+_HTTP_CLIENT = httpx.Client(
+    transport=TracingTransport(httpx.HTTPTransport(
+        limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    )),
+    follow_redirects=True
+)
+
+
+def _build_llm(model: Optional[str] = None) -> ChatOpenAI:
     """
     Constrói o cliente LangChain do LLM.
 
     Centralizar isso facilita:
-    - trocar modelo
+    - trocar modelo (ex: modelos candidatos do shadow)
     - trocar provider
     - ajustar parâmetros
     """
 
     return ChatOpenAI(
-        model=settings.LLM_MODEL,
+        model=model or settings.LLM_MODEL,
         temperature=settings.LLM_TEMPERATURE,
         timeout=settings.LLM_TIMEOUT_SECONDS,
         max_retries=settings.LLM_MAX_RETRIES,
-        api_key=settings.OPENAI_API_KEY
+        streaming=settings.LLM_STREAMING,
+        stream_usage=settings.LLM_STREAMING,
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=_HTTP_CLIENT
+    )
+
+
+# ---------------------------------------------------------
+# PROMPT (PREFIXO ESTÁTICO MONTADO UMA ÚNICA VEZ)
+# ---------------------------------------------------------
+
+_PARSER = PydanticOutputParser(pydantic_object=LLMAnalysisResult)
+
+# format_instructions é estático: entra no system prompt para que
+# o prefixo enviado ao provider seja sempre o mesmo (cache de prefixo).
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    ("human", USER_PROMPT)
+]).partial(
+    format_instructions=_PARSER.get_format_instructions()
+)
+
+# Prompt de re-análise incremental: mesmo prefixo estático do _PROMPT
+_DELTA_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    ("human", DELTA_USER_PROMPT)
+]).partial(
+    format_instructions=_PARSER.get_format_instructions()
+)
+
+
+def render_static_prefix() -> str:
+    """
+    Retorna o prefixo estático (mensagem de sistema) exatamente
+    como é enviado ao provider.
+
+    Usado pelo teste de regressão do cache de prefixo.
+    """
+    return _PROMPT.messages[0].format(
+        **_PROMPT.partial_variables
+    ).content
+
+
+# ---------------------------------------------------------
+# MÉTRICAS DE USO DE TOKENS (IN-PROCESS)
+# ---------------------------------------------------------
+
+_usage_lock = threading.Lock()
+_usage_totals: Dict[str, int] = {
+    "chamadas": 0,
+    "input_tokens": 0,
+    "cached_tokens": 0,
+    "output_tokens": 0
+}
+
+
+def _record_usage(message: AIMessage, accumulate: bool = True) -> Dict[str, int]:
+    """
+    Extrai o uso de tokens da resposta (incluindo tokens servidos
+    pelo cache de prefixo) e, se accumulate, soma nas métricas do processo.
+    """
+
+    usage = message.usage_metadata or {}
+    details = usage.get("input_token_details") or {}
+
+    snapshot = {
+        "input_tokens": usage.get("input_tokens", 0) or 0,
+        "cached_tokens": details.get("cache_read", 0) or 0,
+        "output_tokens": usage.get("output_tokens", 0) or 0
+    }
+
+    if accumulate:
+        with _usage_lock:
+            _usage_totals["chamadas"] += 1
+            for key, value in snapshot.items():
+                _usage_totals[key] += value
+
+    return snapshot
+
+
+def get_llm_usage_metrics() -> Dict[str, float]:
+    """
+    Retorna os totais acumulados de tokens e a taxa de acerto
+    do cache de prefixo.
+    """
+
+    with _usage_lock:
+        metrics: Dict[str, float] = dict(_usage_totals)
+
+    input_tokens = metrics["input_tokens"]
+    metrics["cache_hit_ratio"] = (
+        round(metrics["cached_tokens"] / input_tokens, 4) if input_tokens else 0.0
     )
+    return metrics
 
 
 # ---------------------------------------------------------
-# FUNÇÃO PÚBLICA DO MÓDULO
+# EXECUÇÃO DA CHAIN
+# ---------------------------------------------------------
+
+def _invoke_analysis(
+    prompt: ChatPromptTemplate,
+    variables: Dict[str, str],
+    span_name: str,
+    model: Optional[str] = None,
+    shadow: bool = False
+) -> Tuple[LLMAnalysisResult, Dict[str, int]]:
+    """
+    Executa prompt | llm, registra uso de tokens e valida a saída.
+
+    Chamadas shadow não entram em /metrics/llm nem no log da requisição.
+    """
+
+    model = model or settings.LLM_MODEL
+    llm = _build_llm(model)
+
+    # O parser roda fora da chain para preservar o usage_metadata da resposta
+    chain = prompt | llm
+
+    with tracer.start_as_current_span(span_name) as span:
+        span.set_attribute("gen_ai.request.model", model)
+        span.set_attribute("shadow", shadow)
+
+        message: AIMessage = chain.invoke(variables)
+
+        usage = _record_usage(message, accumulate=not shadow)
+        span.set_attribute("gen_ai.usage.input_tokens", usage["input_tokens"])
+        span.set_attribute("gen_ai.usage.cached_tokens", usage["cached_tokens"])
+        span.set_attribute("gen_ai.usage.output_tokens", usage["output_tokens"])
+
+        if not shadow:
+            annotate_request(llm_usage=usage)
+        logger.info(
+            "llm.usage model=%s shadow=%s input_tokens=%d cached_tokens=%d output_tokens=%d",
+            model, shadow, usage["input_tokens"], usage["cached_tokens"], usage["output_tokens"]
+        )
+
+        return _PARSER.invoke(message), usage
+
+
+def _format_list(values: List[str]) -> str:
+    return ", ".join(values) if values else "Nenhuma"
+
+
+# ---------------------------------------------------------
+# FUNÇÕES PÚBLICAS DO MÓDULO
 # ---------------------------------------------------------
 
 def run_llm_analysis(
@@ -103,26 +265,57 @@ def run_llm_analysis(
     - Apenas entende o texto humano
     """
 
-    llm = _build_llm()
-
-    parser = PydanticOutputParser(
-        pydantic_object=LLMAnalysisResult
+    result, _ = run_llm_analysis_with_usage(
+        cliente=cliente,
+        texto_demanda=texto_demanda,
+        categorias=categorias,
+        restricoes=restricoes
     )
+    return result
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPT),
-        ("human", USER_PROMPT)
-    ]).partial(
-        format_instructions=parser.get_format_instructions()
-    )
 
-    chain = prompt | llm | parser
+def run_llm_analysis_with_usage(
+    cliente: str,
+    texto_demanda: str,
+    categorias: List[str],
+    restricoes: List[str],
+    model: Optional[str] = None,
+    shadow: bool = False
+) -> Tuple[Dict, Dict[str, int]]:
+    """
+    Mesma análise de run_llm_analysis, em um modelo opcionalmente
+    diferente do LLM_MODEL, retornando também o uso de tokens.
 
-    result: LLMAnalysisResult = chain.invoke({
+    shadow=True: não acumula nas métricas globais do processo.
+    """
+
+    result, usage = _invoke_analysis(_PROMPT, {
         "cliente": cliente,
         "texto_demanda": texto_demanda,
         "categorias": ", ".join(categorias),
-        "restricoes": ", ".join(restricoes) if restricoes else "Nenhuma"
-    })
+        "restricoes": _format_list(restricoes)
+    }, span_name="llm.chat", model=model, shadow=shadow)
+
+    return result.model_dump(), usage
+
+
+def run_llm_delta_analysis(
+    analise_anterior: Dict,
+    alteracoes: str,
+    categorias: List[str],
+    restricoes: List[str]
+) -> Dict:
+    """
+    Atualiza uma análise anterior a partir de uma edição pequena no texto.
+
+    Envia só a análise anterior e o diff do texto, não a demanda inteira.
+    """
+
+    result, _ = _invoke_analysis(_DELTA_PROMPT, {
+        "analise_anterior": json.dumps(analise_anterior, ensure_ascii=False),
+        "alteracoes": alteracoes,
+        "categorias": ", ".join(categorias),
+        "restricoes": _format_list(restricoes)
+    }, span_name="llm.chat_delta")
 
     return result.model_dump()
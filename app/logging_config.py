@@ -0,0 +1,208 @@
+"""
+logging_config.py
+
+Logging estruturado (JSON) e não bloqueante do AvivaHub Demand Analyzer.
+
+Como funciona:
+- O event loop apenas enfileira o LogRecord (QueueHandler).
+- Formatação e escrita em stderr acontecem numa thread de fundo
+  (QueueListener), então um stdout/stderr lento não atrasa requisições.
+- Cada record recebe o contexto da requisição (request_id e tempos
+  por etapa) via ContextVar.
+- Logs INFO de alto volume podem ser amostrados (LOG_INFO_SAMPLE_RATE).
+  WARNING ou acima nunca são descartados.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+
+# ---------------------------------------------------------
+# CONTEXTO DA REQUISIÇÃO
+# ---------------------------------------------------------
+
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "avivahub_request_context", default=None
+)
+
+
+def bind_request_context(request_id: str) -> Token:
+    """
+    Abre o contexto de log da requisição. Use reset_request_context no fim.
+    """
+    return _request_context.set({"request_id": request_id, "stages": {}, "fields": {}})
+
+
+def reset_request_context(token: Token) -> None:
+    _request_context.reset(token)
+
+
+def get_request_context() -> Optional[Dict[str, Any]]:
+    return _request_context.get()
+
+
+def record_stage(stage: str, elapsed_ms: float) -> None:
+    """
+    Registra o tempo de uma etapa no contexto da requisição corrente.
+    """
+    context = _request_context.get()
+    if context is not None:
+        context["stages"][stage] = round(elapsed_ms, 2)
+
+
+def annotate_request(**fields: Any) -> None:
+    """
+    Anexa campos extras (ex: uso de tokens) ao contexto da requisição corrente.
+    """
+    context = _request_context.get()
+    if context is not None:
+        context["fields"].update(fields)
+
+
+# ---------------------------------------------------------
+# FILTROS (RODAM NA THREAD DE QUEM LOGA)
+# ---------------------------------------------------------
+
+class RequestContextFilter(logging.Filter):
+    """
+    Copia request_id, tempos por etapa e campos extras para o record.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        if context is not None:
+            record.request_id = context["request_id"]
+            if context["stages"]:
+                record.stages = dict(context["stages"])
+            for key, value in context["fields"].items():
+                setattr(record, key, value)
+        return True
+
+
+class InfoSamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos logs INFO (e abaixo).
+    WARNING ou acima sempre passam.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+# ---------------------------------------------------------
+# HANDLER E FORMATTER
+# ---------------------------------------------------------
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que NÃO formata a mensagem na thread de quem loga.
+
+    O QueueHandler padrão chama format() em prepare(); aqui o record vai
+    intacto para a fila e a formatação acontece no QueueListener.
+    Os args do log devem ser imutáveis (str, números), como já são hoje.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Atributos padrão do LogRecord (o resto é tratado como campo extra)
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata o record como uma linha JSON.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+# ---------------------------------------------------------
+# SETUP
+# ---------------------------------------------------------
+
+_listener: Optional[QueueListener] = None
+
+# O uvicorn instala StreamHandlers próprios (propagate=False) antes de importar o app
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def _route_to_root(names) -> None:
+    """
+    Remove handlers próprios dos loggers informados e faz
+    seus registros propagarem até o QueueHandler do raiz.
+    """
+
+    for name in names:
+        logger = logging.getLogger(name)
+        for existing in list(logger.handlers):
+            logger.removeHandler(existing)
+        logger.propagate = True
+
+
+def setup_logging() -> None:
+    """
+    Configura o logger raiz com QueueHandler + QueueListener.
+    Idempotente.
+    """
+
+    global _listener
+
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if settings.LOG_JSON:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s %(message)s"
+        ))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(InfoSamplingFilter(settings.LOG_INFO_SAMPLE_RATE))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL)
+    _route_to_root(_UVICORN_LOGGERS)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,83 @@
+"""
+loop_monitor.py
+
+Monitor de lag do event loop do serviço.
+
+Uma task acorda a cada EVENT_LOOP_MONITOR_INTERVAL_MS e mede quanto
+atrasou além do intervalo. O atraso é o tempo em que o loop ficou
+bloqueado (ex: chamadas síncronas ao LLM dentro de handlers async).
+
+As contagens são cumulativas por faixa (buckets fixos), então snapshots
+de vários momentos e de vários workers podem ser subtraídos e somados
+(é o que o loadtest.run faz via GET /metrics/event-loop).
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+
+# Limites superiores das faixas de lag (ms); a última faixa é "acima de 10000"
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class EventLoopLagMonitor:
+    """
+    Mede o lag do event loop em que a task roda.
+    """
+
+    def __init__(self, interval_ms: int) -> None:
+        self.interval_s = interval_ms / 1000
+        self.counts: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, lag_ms: float) -> None:
+        index = len(LAG_BUCKETS_MS)
+        for i, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.samples += 1
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            lag_ms = (time.perf_counter() - start - self.interval_s) * 1000
+            self.record(max(0.0, lag_ms))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Contagens cumulativas desde o início do processo.
+        """
+        return {
+            "pid": os.getpid(),
+            "intervalo_ms": int(self.interval_s * 1000),
+            "amostras": self.samples,
+            "max_ms": round(self.max_ms, 2),
+            "buckets_ms": list(LAG_BUCKETS_MS),
+            "contagens": list(self.counts)
+        }
+
+
+monitor = EventLoopLagMonitor(settings.EVENT_LOOP_MONITOR_INTERVAL_MS)
@@ -13,33 +13,64 @@ Importante:
 import time
 import uuid
 import logging
-from typing import Any, Dict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
 
-from fastapi import FastAPI, Request
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
+from opentelemetry import propagate
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from pydantic import ValidationError
 
 from app.schemas import DemandInput, DemandAnalysisOutput
 from app.analyzer import DemandAnalyzer
+from app.config import settings
+from app.llm import get_llm_usage_metrics
+from app.logging_config import (
+    bind_request_context,
+    get_request_context,
+    reset_request_context,
+    setup_logging
+)
+from app.loop_monitor import monitor as loop_monitor
+from app.profiling import (
+    get_profile_path,
+    is_authorized,
+    profile_request,
+    should_profile
+)
+from app.session import AnalysisSession
+from app.shadow import build_report, get_records, schedule_shadow, should_shadow
+from app.tracing import setup_tracing, tracer
 
 # ---------------------------------------------------------
-# LOGGING BÁSICO
+# LOGGING (JSON, NÃO BLOQUEANTE)
 # ---------------------------------------------------------
 
 logger = logging.getLogger("avivahub-demand-analyzer")
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s %(message)s"
-)
+setup_logging()
+
+setup_tracing()
 
 # ---------------------------------------------------------
 # APP FASTAPI
 # ---------------------------------------------------------
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # Lag do event loop do worker, exposto em /metrics/event-loop
+    if settings.EVENT_LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+
+
 app = FastAPI(
     title="AvivaHub - Demand Analyzer",
     version="1.0.0",
-    description="API para análise de demandas de pré-venda de serviços de TI (produto digital, bots, segurança, infraestrutura)."
+    description="API para análise de demandas de pré-venda de serviços de TI (produto digital, bots, segurança, infraestrutura).",
+    lifespan=lifespan
 )
 
 # ---------------------------------------------------------
@@ -69,12 +100,44 @@ analyzer = DemandAnalyzer()
 async def add_request_id_and_timing(request: Request, call_next):
     request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
     request.state.request_id = request_id
+    log_context = bind_request_context(request_id)
 
     start = time.time()
-    response = await call_next(request)
+    profiled = False
+
+    try:
+        # W3C trace-context de entrada (traceparent / tracestate)
+        parent = propagate.extract(request.headers)
+        with tracer.start_as_current_span(
+            f"{request.method} {request.url.path}",
+            context=parent,
+            kind=SpanKind.SERVER
+        ) as span:
+            span.set_attribute("http.request.method", request.method)
+            span.set_attribute("url.path", request.url.path)
+            span.set_attribute("request_id", request_id)
+
+            # Com profiling desligado o custo é apenas esta checagem
+            if settings.PROFILING_ENABLED and should_profile(request, request_id):
+                with profile_request(request_id) as profiled:
+                    response = await call_next(request)
+            else:
+                response = await call_next(request)
+
+            span.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.set_status(Status(StatusCode.ERROR))
+
+            # trace-context de saída para o chamador
+            propagate.inject(response.headers)
+    finally:
+        reset_request_context(log_context)
+
     elapsed_ms = int((time.time() - start) * 1000)
 
     response.headers["x-request-id"] = request_id
+    if profiled:
+        response.headers["x-profile-id"] = request_id
     response.headers["x-response-time-ms"] = str(elapsed_ms)
 
     return response
@@ -114,8 +177,58 @@ def health() -> Dict[str, Any]:
     return {"status": "ok", "service": "avivahub-demand-analyzer"}
 
 
+@app.get("/metrics/llm")
+def llm_metrics() -> Dict[str, Any]:
+    """
+    Totais de tokens consumidos pelo LLM neste processo,
+    incluindo tokens servidos pelo cache de prefixo do provider.
+    """
+    return get_llm_usage_metrics()
+
+
+@app.get("/metrics/event-loop")
+async def event_loop_metrics() -> Dict[str, Any]:
+    """
+    Lag do event loop deste worker (contagens cumulativas por faixa).
+    Usado pelo loadtest.run para medir o lado do serviço.
+    """
+    return loop_monitor.snapshot()
+
+
+@app.get("/shadow/report")
+def shadow_report() -> Dict[str, Any]:
+    """
+    Comparação dos modelos candidatos (shadow traffic) com o modelo primário:
+    latência, tokens e concordância por campo. Dados em memória deste worker.
+    """
+    return build_report(get_records())
+
+
+@app.get("/profiles/{request_id}")
+def download_profile(
+    request_id: str,
+    x_profile: Optional[str] = Header(default=None)
+) -> FileResponse:
+    """
+    Download do profile (.prof, formato pstats) de uma requisição.
+    Exige o mesmo token privilegiado do header x-profile.
+    """
+    if not settings.PROFILING_ENABLED or not is_authorized(x_profile):
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+
+    path = get_profile_path(request_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{request_id}.prof"
+    )
+
+
 @app.post("/analyze-demand", response_model=DemandAnalysisOutput)
-async def analyze_demand(payload: DemandInput, request: Request) -> DemandAnalysisOutput:
+async def analyze_demand(payload: DemandInput, background_tasks: BackgroundTasks) -> DemandAnalysisOutput:
     """
     Executa a análise de demanda.
 
@@ -125,17 +238,80 @@ async def analyze_demand(payload: DemandInput, request: Request) -> DemandAnalys
     Saída:
     - DemandAnalysisOutput (JSON estruturado para dashboard)
     """
-    request_id = getattr(request.state, "request_id", "unknown")
+    # request_id e tempos por etapa entram no log pelo contexto da requisição;
+    # a mensagem só é formatada na thread do QueueListener
     logger.info(
-        "analyze-demand.start request_id=%s cliente=%s categoria=%s urgencia=%s",
-        request_id, payload.cliente, payload.categoria, payload.urgencia
+        "analyze-demand.start cliente=%s categoria=%s urgencia=%s",
+        payload.cliente, payload.categoria, payload.urgencia
     )
 
     result = analyzer.analyze(payload)
 
     logger.info(
-        "analyze-demand.done request_id=%s cliente=%s confianca=%.2f",
-        request_id, payload.cliente, result.confianca_geral
+        "analyze-demand.done cliente=%s confianca=%.2f",
+        payload.cliente, result.confianca_geral
     )
 
+    # Shadow traffic: agendado para depois do envio da resposta
+    if should_shadow():
+        background_tasks.add_task(
+            schedule_shadow, payload, result, get_request_context()
+        )
+
     return result
+
+
+@app.websocket("/ws/analyze-session")
+async def analyze_session(websocket: WebSocket) -> None:
+    """
+    Sessão de re-análise incremental.
+
+    Cada mensagem do cliente é uma DemandInput completa (versão editada).
+    A resposta é uma sequência de eventos JSON: "plano", "regras",
+    "llm" e "resultado" (ou "erro"), enviados conforme ficam prontos.
+    """
+    await websocket.accept()
+
+    session_id = websocket.headers.get("x-request-id") or str(uuid.uuid4())
+    session = AnalysisSession(analyzer)
+    edit = 0
+
+    try:
+        while True:
+            data = await websocket.receive_text()
+            edit += 1
+
+            # JSON inválido também vira ValidationError: a sessão continua viva
+            try:
+                demand = DemandInput.model_validate_json(data)
+            except ValidationError as exc:
+                await websocket.send_json({
+                    "tipo": "erro",
+                    "error": "invalid_input",
+                    "detail": exc.errors(include_url=False, include_context=False)
+                })
+                continue
+
+            request_id = f"{session_id}-{edit}"
+            log_context = bind_request_context(request_id)
+            try:
+                with tracer.start_as_current_span("ws analyze-session.edit") as span:
+                    span.set_attribute("request_id", request_id)
+                    async for event in session.update(demand):
+                        await websocket.send_json(event)
+
+                logger.info("analyze-session.edit cliente=%s", demand.cliente)
+            except WebSocketDisconnect:
+                raise
+            except Exception:
+                logger.exception("analyze-session.error")
+                await websocket.send_json({
+                    "tipo": "erro",
+                    "error": "internal_server_error",
+                    "message": "Ocorreu um erro inesperado ao processar a demanda.",
+                    "request_id": request_id
+                })
+            finally:
+                reset_request_context(log_context)
+    except WebSocketDisconnect:
+        logger.info("analyze-session.closed session_id=%s edicoes=%d", session_id, edit)
@@ -0,0 +1,126 @@
+"""
+profiling.py
+
+Profiling opt-in por requisição (cProfile).
+
+Como ativar (com PROFILING_ENABLED=true):
+- header privilegiado: x-profile: <PROFILING_TOKEN>
+- amostragem: PROFILING_SAMPLE_RATE > 0
+
+O profile cobre middleware, DemandAnalyzer.analyze e run_llm_analysis
+e é salvo em PROFILING_DIR/<request_id>.prof, disponível para download
+em GET /profiles/{request_id}.
+
+Retenção:
+- Se já existe profile para o request_id, a requisição não é profilada
+  (o artefato existente nunca é sobrescrito).
+- Só os PROFILING_MAX_FILES profiles mais recentes são mantidos.
+
+Importante:
+- Com PROFILING_ENABLED=false o custo é uma única checagem de flag.
+- Só uma requisição é profilada por vez (cProfile é global por thread).
+  Requisições concorrentes no mesmo event loop aparecem no profile.
+"""
+
+import cProfile
+import hmac
+import random
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from fastapi import Request
+
+from app.config import settings
+
+
+PROFILE_HEADER = "x-profile"
+
+# request_id vira nome de arquivo: aceitamos apenas caracteres seguros
+_SAFE_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+_profile_lock = threading.Lock()
+
+
+def is_valid_profile_id(request_id: str) -> bool:
+    return bool(_SAFE_ID.match(request_id)) and request_id not in (".", "..")
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """
+    Valida o token privilegiado de profiling.
+    """
+    if not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+def should_profile(request: Request, request_id: str) -> bool:
+    """
+    Decide se a requisição será profilada (header privilegiado ou amostragem).
+    """
+
+    if not is_valid_profile_id(request_id):
+        return False
+
+    if is_authorized(request.headers.get(PROFILE_HEADER)):
+        return True
+
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def get_profile_path(request_id: str) -> Optional[Path]:
+    """
+    Caminho do artefato de profile do request_id, se existir.
+    """
+    if not is_valid_profile_id(request_id):
+        return None
+    path = Path(settings.PROFILING_DIR) / f"{request_id}.prof"
+    return path if path.is_file() else None
+
+
+def _prune_old_profiles(output_dir: Path) -> None:
+    """
+    Remove os profiles mais antigos além de PROFILING_MAX_FILES.
+    """
+    profiles = sorted(output_dir.glob("*.prof"), key=lambda path: path.stat().st_mtime)
+    for path in profiles[:max(0, len(profiles) - settings.PROFILING_MAX_FILES)]:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def profile_request(request_id: str) -> Iterator[bool]:
+    """
+    Profila o bloco e salva o resultado em PROFILING_DIR/<request_id>.prof.
+
+    Retorna False (sem profilar) se outra requisição já estiver em profiling
+    ou se já existir profile para esse request_id.
+    """
+
+    output_dir = Path(settings.PROFILING_DIR)
+    output_path = output_dir / f"{request_id}.prof"
+
+    if not _profile_lock.acquire(blocking=False):
+        yield False
+        return
+
+    if output_path.exists():
+        _profile_lock.release()
+        yield False
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        yield True
+    finally:
+        profiler.disable()
+        try:
+            # Requisições que falharam também geram profile
+            output_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(output_path))
+            _prune_old_profiles(output_dir)
+        finally:
+            _profile_lock.release()
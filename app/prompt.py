@@ -1,3 +1,27 @@
+"""
+prompt.py
+
+Prompts usados pelo Analisador de Demandas do AvivaHub.
+
+Layout pensado para o cache automático de prefixo do provider:
+- Tudo que é estático (regras + format_instructions) vem PRIMEIRO,
+  na mensagem de sistema, formando um prefixo byte a byte idêntico
+  entre chamadas.
+- Os campos variáveis da demanda vêm POR ÚLTIMO, na mensagem humana.
+
+Qualquer alteração no SYSTEM_PROMPT muda o prefixo e invalida o cache.
+O teste tests/test_prompt.py protege contra mudanças acidentais.
+
+LIMITAÇÃO ATUAL:
+- A OpenAI só cacheia prompts a partir de 1024 tokens.
+- O prefixo estático tem ~1.7k caracteres (~450-500 tokens), abaixo do mínimo.
+- Com o prompt como está, cached_tokens fica 0 e /metrics/llm
+  mostra cache_hit_ratio 0. O layout só passa a render economia quando
+  o prefixo crescer (ex: few-shot, catálogo de categorias no system prompt).
+- Para confirmar que o cache passou a valer, acompanhe cached_tokens
+  em /metrics/llm.
+"""
+
 SYSTEM_PROMPT = """
 Você é um analista de demandas de serviços de TI.
 
@@ -7,6 +31,9 @@ Regras obrigatórias:
 - NÃO sugerir arquitetura
 - NÃO inventar tecnologias
 - Apenas interpretar e sintetizar o texto fornecido
+
+Formato de resposta:
+{format_instructions}
 """
 
 USER_PROMPT = """
@@ -17,6 +44,21 @@ Restrições conhecidas: {restricoes}
 
 Texto da demanda:
 {texto_demanda}
+"""
 
-{format_instructions}
+# Re-análise incremental (sessões WebSocket): a análise anterior
+# e o diff do texto substituem o texto completo da demanda.
+DELTA_USER_PROMPT = """
+Análise anterior (JSON):
+{analise_anterior}
+
+O texto da demanda foi editado. Alterações
+(linhas "-" removidas, linhas "+" adicionadas, "~" contexto):
+{alteracoes}
+
+Categorias sugeridas: {categorias}
+Restrições conhecidas: {restricoes}
+
+Atualize a análise anterior considerando apenas as alterações.
+Mantenha o que não foi afetado por elas.
 """
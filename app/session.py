@@ -0,0 +1,175 @@
+"""
+session.py
+
+Sessões de re-análise incremental (WebSocket) do AvivaHub.
+
+A pré-venda edita a mesma demanda várias vezes durante uma call.
+A sessão guarda a última DemandInput, as categorias e o resultado do
+LLM e, a cada edição, refaz apenas o que o diff afeta:
+
+- restricoes / urgencia / categoria: só a etapa de regras (sem LLM)
+- edição pequena no texto: prompt delta (análise anterior + diff)
+- cliente novo ou edição grande: análise completa
+
+A similaridade é medida contra o texto da última análise completa, não
+contra a edição anterior: uma sequência de deltas pequenos não pode
+afastar o texto da base indefinidamente.
+
+Os campos atualizados são enviados assim que ficam prontos.
+"""
+
+import difflib
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.analyzer import DemandAnalyzer
+from app.config import settings
+from app.schemas import DemandInput
+
+
+# Planos de re-análise
+PLAN_FULL = "completo"
+PLAN_DELTA = "delta"
+PLAN_RULES = "regras"
+PLAN_NONE = "sem_alteracao"
+
+# Palavras de contexto ao redor de cada trecho alterado no diff
+_DIFF_CONTEXT_WORDS = 4
+
+
+# ---------------------------------------------------------
+# DIFF DE TEXTO
+# ---------------------------------------------------------
+
+def describe_text_changes(old: str, new: str) -> Tuple[float, str]:
+    """
+    Compara os textos palavra a palavra.
+
+    Retorna a similaridade (0 a 1) e o diff em linhas:
+    "~" contexto, "-" removido, "+" adicionado.
+    """
+
+    old_words = old.split()
+    new_words = new.split()
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+
+    lines: List[str] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+
+        context = old_words[max(0, i1 - _DIFF_CONTEXT_WORDS):i1]
+        if context:
+            lines.append("~ " + " ".join(context))
+        if i2 > i1:
+            lines.append("- " + " ".join(old_words[i1:i2]))
+        if j2 > j1:
+            lines.append("+ " + " ".join(new_words[j1:j2]))
+
+    return matcher.ratio(), "\n".join(lines)
+
+
+# ---------------------------------------------------------
+# SESSÃO
+# ---------------------------------------------------------
+
+class AnalysisSession:
+    """
+    Estado de uma sessão de edição (uma conexão WebSocket).
+    """
+
+    def __init__(self, analyzer: DemandAnalyzer) -> None:
+        self.analyzer = analyzer
+        self.demand: Optional[DemandInput] = None
+        self.categories: Set[str] = set()
+        self.llm_result: Optional[Dict] = None
+        # Texto da última análise completa (base para medir a deriva)
+        self.baseline_text: Optional[str] = None
+
+    def plan(self, demand: DemandInput) -> Tuple[str, str]:
+        """
+        Decide o que precisa ser refeito para a nova versão da demanda.
+
+        Retorna (plano, diff do texto). O diff só é usado no plano delta.
+        """
+
+        previous = self.demand
+
+        if (
+            previous is None
+            or self.llm_result is None
+            or self.baseline_text is None
+            or previous.cliente != demand.cliente
+        ):
+            return PLAN_FULL, ""
+
+        # Só espaços/quebras de linha mudaram: o LLM veria o mesmo texto
+        if previous.texto_demanda.split() != demand.texto_demanda.split():
+            similarity, _ = describe_text_changes(self.baseline_text, demand.texto_demanda)
+            if similarity < settings.SESSION_DELTA_MIN_SIMILARITY:
+                return PLAN_FULL, ""
+
+            # O delta parte da análise anterior: o diff é contra a edição anterior
+            _, changes = describe_text_changes(previous.texto_demanda, demand.texto_demanda)
+            return PLAN_DELTA, changes
+
+        if (
+            previous.restricoes != demand.restricoes
+            or previous.urgencia != demand.urgencia
+            or previous.categoria != demand.categoria
+        ):
+            return PLAN_RULES, ""
+
+        return PLAN_NONE, ""
+
+    async def update(self, demand: DemandInput) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Aplica uma edição e produz os eventos a enviar ao cliente, na ordem:
+        "plano", "regras" (se mudou), "llm" (se rodou) e "resultado".
+        """
+
+        start = time.perf_counter()
+        plan, changes = self.plan(demand)
+        yield {"tipo": "plano", "plano": plan}
+
+        categories = self.analyzer.classify(demand)
+        team, effort = self.analyzer.apply_rules(categories)
+
+        if plan != PLAN_NONE:
+            yield {
+                "tipo": "regras",
+                "proposta_de_time": [role.model_dump(mode="json") for role in team],
+                "estimativa_esforco": effort.model_dump(mode="json")
+            }
+
+        llm_result = self.llm_result
+
+        # Chamadas ao LLM são bloqueantes: rodam fora do event loop
+        if plan == PLAN_FULL:
+            llm_result = await run_in_threadpool(
+                self.analyzer.understand, demand, categories
+            )
+        elif plan == PLAN_DELTA:
+            llm_result = await run_in_threadpool(
+                self.analyzer.understand_delta, demand, categories, self.llm_result, changes
+            )
+
+        if plan in (PLAN_FULL, PLAN_DELTA):
+            yield {"tipo": "llm", **llm_result}
+
+        # Estado só avança depois que todas as etapas deram certo
+        self.demand = demand
+        self.categories = categories
+        self.llm_result = llm_result
+        if plan == PLAN_FULL:
+            self.baseline_text = demand.texto_demanda
+
+        output = self.analyzer.build_output(llm_result, team, effort)
+        yield {
+            "tipo": "resultado",
+            "plano": plan,
+            "elapsed_ms": int((time.perf_counter() - start) * 1000),
+            "resultado": output.model_dump(mode="json")
+        }
@@ -0,0 +1,320 @@
+"""
+shadow.py
+
+Avaliação de modelos candidatos com tráfego sombra (shadow traffic).
+
+Uma amostra (SHADOW_SAMPLE_RATE) das requisições de /analyze-demand é
+reenviada, em segundo plano, para cada modelo de SHADOW_MODELS.
+Para cada chamada registramos:
+- latência e tokens do candidato vs. primário
+- concordância por campo com o LLMAnalysisResult primário
+  (Jaccard de principais_dores e tecnologias_mencionadas,
+  delta de confianca_geral)
+
+Importante:
+- O shadow só é agendado DEPOIS que a resposta primária foi enviada
+  e roda num pool de threads próprio: nunca adiciona latência ao usuário.
+- Se o pool estiver cheio (SHADOW_MAX_PENDING), a amostra é descartada.
+- O pool herda os contextvars da requisição: cada candidato vira um span
+  "shadow.<modelo>" (atributo shadow=true) no mesmo trace do primário.
+
+Relatório: GET /shadow/report (memória do worker) ou, para agregar
+vários workers a partir do SHADOW_RESULTS_PATH:
+    python -m app.shadow shadow.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from app.analyzer import categorize_demand
+from app.config import settings
+from app.llm import run_llm_analysis_with_usage
+from app.schemas import DemandAnalysisOutput, DemandInput
+from app.tracing import tracer
+
+logger = logging.getLogger("avivahub-demand-analyzer.shadow")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_pending = 0
+_pending_lock = threading.Lock()
+
+_records: Deque[Dict[str, Any]] = deque(maxlen=settings.SHADOW_MAX_RECORDS)
+_records_lock = threading.Lock()
+
+
+# ---------------------------------------------------------
+# CONCORDÂNCIA ENTRE RESULTADOS
+# ---------------------------------------------------------
+
+def _normalize(values: Iterable[str]) -> set:
+    return {" ".join(value.lower().split()) for value in values if value and value.strip()}
+
+
+def jaccard(a: Iterable[str], b: Iterable[str]) -> float:
+    """
+    Sobreposição entre duas listas de textos (case/espaços ignorados).
+    Duas listas vazias concordam totalmente.
+    """
+    set_a, set_b = _normalize(a), _normalize(b)
+    if not set_a and not set_b:
+        return 1.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+def compare_results(primary: Dict, candidate: Dict) -> Dict[str, float]:
+    """
+    Concordância campo a campo entre o resultado primário e o do candidato.
+    """
+    return {
+        "principais_dores": round(jaccard(
+            primary.get("principais_dores", []), candidate.get("principais_dores", [])
+        ), 4),
+        "tecnologias_mencionadas": round(jaccard(
+            primary.get("tecnologias_mencionadas", []), candidate.get("tecnologias_mencionadas", [])
+        ), 4),
+        "confianca_delta": round(
+            candidate.get("confianca_geral", 0.0) - primary.get("confianca_geral", 0.0), 4
+        )
+    }
+
+
+# ---------------------------------------------------------
+# AGENDAMENTO E EXECUÇÃO
+# ---------------------------------------------------------
+
+def should_shadow() -> bool:
+    """
+    Decide se a requisição corrente entra na amostra do shadow.
+    """
+    return bool(settings.SHADOW_MODELS) and random.random() < settings.SHADOW_SAMPLE_RATE
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.SHADOW_MAX_WORKERS,
+                thread_name_prefix="shadow"
+            )
+        return _executor
+
+
+def _release_slot(_future: Any) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def schedule_shadow(
+    demand: DemandInput,
+    primary: DemandAnalysisOutput,
+    request_context: Optional[Dict[str, Any]]
+) -> None:
+    """
+    Background task de /analyze-demand: apenas enfileira o shadow
+    no pool dedicado e retorna (não ocupa o threadpool das requisições).
+    """
+
+    global _pending
+
+    with _pending_lock:
+        if _pending >= settings.SHADOW_MAX_PENDING:
+            logger.warning("shadow.dropped pending=%d", _pending)
+            return
+        _pending += 1
+
+    context = request_context or {}
+
+    # Threads do pool não herdam contextvars: sem a cópia, os spans
+    # do shadow abririam traces novos, desligados da requisição
+    future = _get_executor().submit(
+        contextvars.copy_context().run,
+        run_shadow,
+        demand,
+        primary.model_dump(include={
+            "resumo_executivo",
+            "objetivo_do_cliente",
+            "principais_dores",
+            "tecnologias_mencionadas",
+            "confianca_geral"
+        }),
+        context.get("request_id"),
+        context.get("stages", {}).get("llm_analysis"),
+        context.get("fields", {}).get("llm_usage")
+    )
+    future.add_done_callback(_release_slot)
+
+
+def run_shadow(
+    demand: DemandInput,
+    primary_result: Dict,
+    request_id: Optional[str] = None,
+    primary_latency_ms: Optional[float] = None,
+    primary_usage: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Executa a demanda em cada modelo candidato e registra a comparação.
+    """
+
+    # Sem analyzer.classify: o contexto copiado é o da requisição primária,
+    # que já terminou; _stage sobrescreveria seus tempos e duplicaria o span
+    categories = categorize_demand(demand)
+    records = []
+
+    for model in settings.SHADOW_MODELS:
+        record: Dict[str, Any] = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "request_id": request_id,
+            "modelo": model,
+            "modelo_primario": settings.LLM_MODEL,
+            "latencia_primaria_ms": primary_latency_ms,
+            "tokens_primarios": primary_usage,
+            "ok": False
+        }
+
+        start = time.perf_counter()
+        with tracer.start_as_current_span(f"shadow.{model}") as span:
+            span.set_attribute("shadow", True)
+            span.set_attribute("gen_ai.request.model", model)
+            try:
+                candidate, usage = run_llm_analysis_with_usage(
+                    cliente=demand.cliente,
+                    texto_demanda=demand.texto_demanda,
+                    categorias=list(categories),
+                    restricoes=demand.restricoes or [],
+                    model=model,
+                    shadow=True
+                )
+            except Exception as exc:
+                record["erro"] = exc.__class__.__name__
+                span.set_attribute("error.type", record["erro"])
+                logger.warning("shadow.error modelo=%s erro=%s", model, record["erro"])
+            else:
+                record.update({
+                    "ok": True,
+                    "tokens": usage,
+                    "concordancia": compare_results(primary_result, candidate)
+                })
+        record["latencia_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        _store(record)
+        records.append(record)
+
+    return records
+
+
+def _store(record: Dict[str, Any]) -> None:
+    with _records_lock:
+        _records.append(record)
+
+        if settings.SHADOW_RESULTS_PATH:
+            with open(settings.SHADOW_RESULTS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def get_records() -> List[Dict[str, Any]]:
+    with _records_lock:
+        return list(_records)
+
+
+# ---------------------------------------------------------
+# RELATÓRIO
+# ---------------------------------------------------------
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    Percentil por nearest-rank (None se não houver amostras).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return round(ordered[rank - 1], 2)
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def _latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {"p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+
+
+def _tokens_summary(usages: List[Dict[str, int]]) -> Dict[str, Optional[float]]:
+    return {
+        key: _mean([usage.get(key, 0) for usage in usages])
+        for key in ("input_tokens", "cached_tokens", "output_tokens")
+    }
+
+
+def build_report(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Agrega os registros do shadow por modelo candidato.
+    """
+
+    by_model: Dict[str, List[Dict[str, Any]]] = {}
+    primary_models = set()
+    for record in records:
+        by_model.setdefault(record["modelo"], []).append(record)
+        primary_models.add(record["modelo_primario"])
+
+    modelos = {}
+    for model, items in sorted(by_model.items()):
+        ok = [item for item in items if item.get("ok")]
+        agreement = [item["concordancia"] for item in ok]
+        primary_latencies = [
+            item["latencia_primaria_ms"] for item in items
+            if item.get("latencia_primaria_ms") is not None
+        ]
+
+        modelos[model] = {
+            "amostras": len(items),
+            "erros": len(items) - len(ok),
+            "taxa_erro": round((len(items) - len(ok)) / len(items), 4),
+            "latencia_ms": _latency_summary([item["latencia_ms"] for item in ok]),
+            "latencia_primaria_ms": _latency_summary(primary_latencies),
+            "tokens_medios": _tokens_summary([item["tokens"] for item in ok]),
+            "tokens_medios_primarios": _tokens_summary(
+                [item["tokens_primarios"] for item in items if item.get("tokens_primarios")]
+            ),
+            "concordancia_media": {
+                "principais_dores": _mean([a["principais_dores"] for a in agreement]),
+                "tecnologias_mencionadas": _mean([a["tecnologias_mencionadas"] for a in agreement]),
+                "confianca_delta": _mean([a["confianca_delta"] for a in agreement]),
+                "confianca_delta_abs": _mean([abs(a["confianca_delta"]) for a in agreement])
+            }
+        }
+
+    return {"modelos_primarios": sorted(primary_models), "modelos": modelos}
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relatório do shadow traffic a partir de um JSONL")
+    parser.add_argument("path", help="Arquivo gravado em SHADOW_RESULTS_PATH")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    print(json.dumps(build_report(records), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
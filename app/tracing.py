@@ -0,0 +1,141 @@
+"""
+tracing.py
+
+Tracing distribuído (OpenTelemetry) do AvivaHub Demand Analyzer.
+
+Spans gerados:
+- requisição HTTP (middleware), com W3C trace-context de entrada e saída
+- cada etapa do DemandAnalyzer.analyze
+- cada tentativa HTTP ao LLM (inclusive retries do SDK da OpenAI),
+  propagando traceparent para o gateway upstream
+
+Exporter configurável via TRACING_EXPORTER:
+- none: sem exporter (spans não são gravados)
+- console: stdout
+- file: JSON lines em TRACING_FILE_PATH (uso offline)
+- otlp: OTLP/HTTP (requer opentelemetry-exporter-otlp-proto-http,
+  configurado pelas variáveis OTEL_EXPORTER_OTLP_*)
+- "pacote.modulo:fabrica": fábrica customizada que retorna um SpanExporter
+"""
+
+import importlib
+import os
+from typing import Optional
+
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.config import settings
+
+
+tracer = trace.get_tracer("avivahub-demand-analyzer")
+
+_configured = False
+
+
+# ---------------------------------------------------------
+# EXPORTERS
+# ---------------------------------------------------------
+
+def _build_exporter(name: str) -> Optional[SpanExporter]:
+    """
+    Resolve o exporter configurado.
+    """
+
+    name = name.strip()
+
+    if name.lower() == "none":
+        return None
+
+    if name.lower() == "console":
+        return ConsoleSpanExporter()
+
+    if name.lower() == "file":
+        out = open(settings.TRACING_FILE_PATH, "a", encoding="utf-8")
+        return ConsoleSpanExporter(
+            out=out,
+            formatter=lambda span: span.to_json(indent=None) + os.linesep
+        )
+
+    if name.lower() == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+
+    if ":" in name:
+        module_name, factory_name = name.split(":", 1)
+        factory = getattr(importlib.import_module(module_name), factory_name)
+        return factory()
+
+    raise ValueError(f"TRACING_EXPORTER inválido: {name}")
+
+
+def setup_tracing(exporter: Optional[SpanExporter] = None) -> None:
+    """
+    Registra o TracerProvider global com o exporter configurado.
+
+    Sem exporter, nada é registrado e os spans ficam no-op
+    (o trace-context continua sendo propagado).
+    """
+
+    global _configured
+
+    if _configured:
+        return
+
+    exporter = exporter or _build_exporter(settings.TRACING_EXPORTER)
+    if exporter is None:
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+
+
+# ---------------------------------------------------------
+# PROPAGAÇÃO PARA O UPSTREAM (LLM)
+# ---------------------------------------------------------
+
+class TracingTransport(httpx.BaseTransport):
+    """
+    Transport httpx que cria um span por tentativa HTTP e injeta
+    o traceparent nos headers enviados ao provider/gateway.
+
+    Como o SDK da OpenAI refaz a requisição a cada retry, cada
+    tentativa vira um span próprio. Em streaming, o span termina
+    no recebimento dos headers da resposta.
+    """
+
+    def __init__(self, wrapped: httpx.BaseTransport) -> None:
+        self._wrapped = wrapped
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with tracer.start_as_current_span("llm.http_attempt", kind=SpanKind.CLIENT) as span:
+            span.set_attribute("http.request.method", request.method)
+            span.set_attribute("url.full", str(request.url))
+
+            retry_count = request.headers.get("x-stainless-retry-count")
+            if retry_count is not None:
+                span.set_attribute("http.request.resend_count", int(retry_count))
+
+            propagate.inject(request.headers)
+            response = self._wrapped.handle_request(request)
+
+            span.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 400:
+                span.set_status(Status(StatusCode.ERROR))
+
+            return response
+
+    def close(self) -> None:
+        self._wrapped.close()
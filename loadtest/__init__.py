@@ -0,0 +1,10 @@
+"""
+loadtest
+
+Ferramentas de load test do AvivaHub Demand Analyzer.
+
+- stub_openai: stub local da API de chat completions da OpenAI
+- run: sobe stub + API e dispara carga open-loop em /analyze-demand
+
+Nenhuma chamada real ao provider é feita.
+"""
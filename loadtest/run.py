@@ -0,0 +1,377 @@
+"""
+run.py
+
+Load test end-to-end do /analyze-demand contra o stub local da OpenAI.
+
+Fluxo:
+1. Sobe o stub (loadtest.stub_openai) em um subprocesso
+2. Sobe a API (uvicorn app.main:app) apontando o ChatOpenAI para o stub
+3. Dispara carga open-loop (chegadas Poisson) na taxa pedida
+4. Reporta percentis de latência (HDR histogram), throughput,
+   erros por tipo e lag do event loop do serviço (GET /metrics/event-loop,
+   por worker) e do gerador de carga
+
+A latência é medida a partir do instante PLANEJADO de envio, o que
+corrige coordinated omission quando o gerador atrasa.
+
+Uso:
+    python -m loadtest.run --rps 100 --duration 60 --workers 4 --latency-ms 800
+    python -m loadtest.run --rps 50 --target http://localhost:8000   # API já rodando
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+from hdrh.histogram import HdrHistogram
+
+from loadtest.stub_openai import add_stub_arguments
+
+
+# Latências registradas em microssegundos, de 1us até 10 min, 3 dígitos significativos
+_HIST_MIN_US = 1
+_HIST_MAX_US = 600_000_000
+_HIST_DIGITS = 3
+
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+SAMPLE_PAYLOAD: Dict[str, Any] = {
+    "cliente": "Hospital São Lucas",
+    "texto_demanda": (
+        "Cliente quer desenvolver um aplicativo para acompanhar chamados internos, "
+        "com notificações por WhatsApp e hospedagem na AWS."
+    ),
+    "restricoes": ["LGPD", "prazo curto"],
+    "urgencia": "alta"
+}
+
+
+def _new_histogram() -> HdrHistogram:
+    return HdrHistogram(_HIST_MIN_US, _HIST_MAX_US, _HIST_DIGITS)
+
+
+# ---------------------------------------------------------
+# PROCESSOS (STUB + API)
+# ---------------------------------------------------------
+
+def _start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "loadtest.stub_openai",
+        "--port", str(args.stub_port),
+        "--latency-ms", str(args.latency_ms),
+        "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+        "--stream-chunks", str(args.stream_chunks),
+        "--cached-tokens", str(args.cached_tokens)
+    ]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    return subprocess.Popen(cmd)
+
+
+def _start_api(args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "loadtest",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.stub_port}/v1",
+        "LLM_MAX_RETRIES": str(args.llm_max_retries),
+        "LLM_STREAMING": "true" if args.stream else "false"
+    })
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(args.api_port),
+        "--workers", str(args.workers),
+        "--log-level", "warning"
+    ]
+    return subprocess.Popen(cmd, env=env)
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Serviço não respondeu a tempo: {url}")
+
+
+def _stop(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# ---------------------------------------------------------
+# GERADOR DE CARGA (OPEN-LOOP)
+# ---------------------------------------------------------
+
+class LoadResult:
+    """
+    Acumula as medições de uma execução.
+    """
+
+    def __init__(self) -> None:
+        self.latency = _new_histogram()
+        self.loop_lag = _new_histogram()
+        self.errors: Counter = Counter()
+        self.sent = 0
+        self.ok = 0
+        self.elapsed_s = 0.0
+        # Snapshots de /metrics/event-loop por pid do worker (primeiro e último)
+        self.server_lag_first: Dict[int, Dict[str, Any]] = {}
+        self.server_lag_last: Dict[int, Dict[str, Any]] = {}
+
+    def server_lag_report(self) -> Optional[Dict[str, Any]]:
+        """
+        Soma, entre workers, as contagens de lag acumuladas durante a carga.
+        Percentis são o limite superior da faixa (buckets fixos do serviço).
+        """
+
+        if not self.server_lag_last:
+            return None
+
+        bounds: List[float] = []
+        counts: List[int] = []
+        max_ms = 0.0
+        for pid, last in self.server_lag_last.items():
+            first = self.server_lag_first[pid]
+            bounds = last["buckets_ms"]
+            delta = [b - a for a, b in zip(first["contagens"], last["contagens"])]
+            counts = [c + d for c, d in zip(counts, delta)] if counts else delta
+            max_ms = max(max_ms, last["max_ms"])
+
+        total = sum(counts)
+        data: Dict[str, Any] = {"workers_observados": len(self.server_lag_last), "amostras": total}
+
+        for p in PERCENTILES:
+            value = None
+            if total:
+                threshold = p / 100 * total
+                cumulative = 0
+                for i, count in enumerate(counts):
+                    cumulative += count
+                    if cumulative >= threshold:
+                        value = bounds[i] if i < len(bounds) else max_ms
+                        break
+            data[f"p{p:g}"] = value
+
+        # max_ms é do processo inteiro (desde o start do worker)
+        data["max"] = max_ms
+        return data
+
+    def report(self) -> Dict[str, Any]:
+        def percentiles(hist: HdrHistogram) -> Dict[str, float]:
+            data = {
+                f"p{p:g}": round(hist.get_value_at_percentile(p) / 1000, 2)
+                for p in PERCENTILES
+            }
+            data["max"] = round(hist.get_max_value() / 1000, 2)
+            data["mean"] = round(hist.get_mean_value() / 1000, 2)
+            return data
+
+        return {
+            "enviadas": self.sent,
+            "sucesso": self.ok,
+            "erros": dict(self.errors),
+            "duracao_s": round(self.elapsed_s, 2),
+            "throughput_rps": round(self.ok / self.elapsed_s, 2) if self.elapsed_s else 0.0,
+            "latencia_ms": percentiles(self.latency),
+            "event_loop_lag_servico_ms": self.server_lag_report(),
+            "event_loop_lag_gerador_ms": percentiles(self.loop_lag)
+        }
+
+
+async def _monitor_loop_lag(result: LoadResult, stop: asyncio.Event, interval: float = 0.01) -> None:
+    """
+    Mede o atraso do event loop do gerador. Lag alto invalida a medição
+    (o gerador passou a ser o gargalo).
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = time.perf_counter() - start - interval
+        result.loop_lag.record_value(max(_HIST_MIN_US, int(lag * 1_000_000)))
+
+
+async def _scrape_server_lag(
+    base_url: str,
+    result: LoadResult,
+    stop: asyncio.Event,
+    interval: float = 0.5
+) -> None:
+    """
+    Coleta periodicamente o lag do event loop do serviço. Com vários
+    workers, cada scrape cai em um worker; guardamos o primeiro e o
+    último snapshot de cada pid.
+    """
+
+    url = f"{base_url.rstrip('/')}/metrics/event-loop"
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        while True:
+            try:
+                response = await client.get(url)
+                if response.status_code == 404:
+                    return
+                snapshot = response.json()
+                result.server_lag_first.setdefault(snapshot["pid"], snapshot)
+                result.server_lag_last[snapshot["pid"]] = snapshot
+            except (httpx.HTTPError, ValueError, KeyError):
+                pass
+
+            if stop.is_set():
+                return
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _send_one(
+    client: httpx.AsyncClient,
+    url: str,
+    scheduled_at: float,
+    result: LoadResult
+) -> None:
+    try:
+        response = await client.post(url, json=SAMPLE_PAYLOAD)
+        if response.status_code == 200:
+            result.ok += 1
+        else:
+            result.errors[f"http_{response.status_code}"] += 1
+    except httpx.HTTPError as exc:
+        result.errors[exc.__class__.__name__] += 1
+    finally:
+        latency_us = int((time.perf_counter() - scheduled_at) * 1_000_000)
+        result.latency.record_value(min(_HIST_MAX_US, max(_HIST_MIN_US, latency_us)))
+
+
+async def drive(
+    base_url: str,
+    rps: float,
+    duration_s: float,
+    timeout_s: float,
+    seed: Optional[int] = None
+) -> LoadResult:
+    """
+    Dispara requisições com chegadas Poisson na taxa `rps`, sem esperar
+    as respostas anteriores (open-loop).
+    """
+
+    result = LoadResult()
+    rng = random.Random(seed)
+    stop = asyncio.Event()
+    url = f"{base_url.rstrip('/')}/analyze-demand"
+    pending: List[asyncio.Task] = []
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=timeout_s, limits=limits) as client:
+        monitor = asyncio.create_task(_monitor_loop_lag(result, stop))
+        scraper = asyncio.create_task(_scrape_server_lag(base_url, result, stop))
+
+        start = time.perf_counter()
+        next_at = start
+        end = start + duration_s
+
+        while next_at < end:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(_send_one(client, url, next_at, result)))
+            result.sent += 1
+            next_at += rng.expovariate(rps)
+
+        await asyncio.gather(*pending)
+        result.elapsed_s = time.perf_counter() - start
+
+        stop.set()
+        await monitor
+        await scraper
+
+    return result
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print("\n=== AvivaHub Demand Analyzer - load test ===")
+    print(f"Enviadas: {report['enviadas']}  Sucesso: {report['sucesso']}  "
+          f"Duração: {report['duracao_s']}s  Throughput: {report['throughput_rps']} req/s")
+
+    for titulo, chave in (
+        ("Latência (ms)", "latencia_ms"),
+        ("Event loop lag do serviço (ms)", "event_loop_lag_servico_ms"),
+        ("Event loop lag do gerador (ms)", "event_loop_lag_gerador_ms")
+    ):
+        if report[chave] is None:
+            print(f"{titulo}: indisponível")
+            continue
+        valores = "  ".join(f"{k}={v}" for k, v in report[chave].items())
+        print(f"{titulo}: {valores}")
+
+    if report["erros"]:
+        print("Erros:")
+        for tipo, total in sorted(report["erros"].items(), key=lambda item: -item[1]):
+            print(f"  {tipo}: {total}")
+    else:
+        print("Erros: nenhum")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test open-loop do /analyze-demand")
+    parser.add_argument("--rps", type=float, default=50.0, help="Taxa de chegada (req/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração da carga (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por requisição (s)")
+    parser.add_argument("--target", default=None, help="URL de uma API já rodando (não sobe stub nem API)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--api-port", type=int, default=8800)
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--llm-max-retries", type=int, default=0)
+    parser.add_argument("--stream", action="store_true", help="Usa streaming entre API e stub")
+    parser.add_argument("--json", dest="json_path", default=None, help="Salva o relatório em JSON")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = api = None
+    base_url = args.target
+
+    try:
+        if base_url is None:
+            stub = _start_stub(args)
+            api = _start_api(args)
+            base_url = f"http://127.0.0.1:{args.api_port}"
+            _wait_until_ready(f"http://127.0.0.1:{args.stub_port}/docs")
+            _wait_until_ready(f"{base_url}/health")
+
+        result = asyncio.run(drive(base_url, args.rps, args.duration, args.timeout, args.seed))
+    finally:
+        _stop(api)
+        _stop(stub)
+
+    report = result.report()
+    _print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
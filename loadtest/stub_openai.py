@@ -0,0 +1,237 @@
+"""
+stub_openai.py
+
+Stub local compatível com POST /v1/chat/completions da OpenAI.
+
+Serve para medir o comportamento do serviço sob carga sem pagar
+chamadas reais. Simula:
+- latência com distribuição log-normal (mediana + sigma)
+- taxa de erro configurável (429/500)
+- respostas em streaming (SSE) quando o cliente pede stream=true
+
+Uso:
+    python -m loadtest.stub_openai --port 8900 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# ---------------------------------------------------------
+# CONFIGURAÇÃO DO STUB
+# ---------------------------------------------------------
+
+@dataclass
+class StubConfig:
+    """
+    Parâmetros de comportamento do stub.
+    """
+
+    latency_median_ms: float = 800.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    error_status: int = 429
+    stream_chunks: int = 20
+    prompt_tokens: int = 900
+    cached_tokens: int = 0
+    seed: Optional[int] = None
+
+
+# Resposta que satisfaz o schema LLMAnalysisResult
+STUB_ANALYSIS: Dict[str, Any] = {
+    "resumo_executivo": "Cliente busca digitalizar o acompanhamento de chamados internos.",
+    "objetivo_do_cliente": "Centralizar e acompanhar chamados internos em um aplicativo.",
+    "principais_dores": [
+        "Chamados controlados em planilhas",
+        "Falta de visibilidade sobre o status"
+    ],
+    "tecnologias_mencionadas": ["WhatsApp"],
+    "confianca_geral": 0.8
+}
+
+
+def _sample_latency_seconds(config: StubConfig, rng: random.Random) -> float:
+    """
+    Sorteia a latência de uma resposta (log-normal em torno da mediana).
+    """
+    if config.latency_median_ms <= 0:
+        return 0.0
+    return rng.lognormvariate(math.log(config.latency_median_ms), config.latency_sigma) / 1000
+
+
+def _usage(config: StubConfig, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": config.prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": config.prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": config.cached_tokens}
+    }
+
+
+async def _stream_events(
+    config: StubConfig,
+    model: str,
+    content: str,
+    chunk_delay: float,
+    include_usage: bool
+) -> AsyncIterator[str]:
+    """
+    Gera os eventos SSE no formato chat.completion.chunk.
+
+    Gerador assíncrono: o atraso entre chunks não ocupa threads do
+    threadpool do Starlette, então o stub não vira gargalo em streaming.
+    """
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    size = max(1, math.ceil(len(content) / max(1, config.stream_chunks)))
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for start in range(0, len(content), size):
+        if chunk_delay:
+            await asyncio.sleep(chunk_delay)
+        yield chunk({"content": content[start:start + size]})
+    yield chunk({}, finish_reason="stop")
+
+    if include_usage:
+        usage_chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [],
+            "usage": _usage(config, config.stream_chunks)
+        }
+        yield f"data: {json.dumps(usage_chunk)}\n\n"
+
+    yield "data: [DONE]\n\n"
+
+
+# ---------------------------------------------------------
+# APP DO STUB
+# ---------------------------------------------------------
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    """
+    Cria o app FastAPI do stub com o comportamento configurado.
+    """
+
+    app = FastAPI(title="OpenAI stub (load test)")
+    rng = random.Random(config.seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        latency = _sample_latency_seconds(config, rng)
+
+        if rng.random() < config.error_rate:
+            await asyncio.sleep(latency)
+            return JSONResponse(
+                status_code=config.error_status,
+                content={"error": {
+                    "message": "Erro simulado pelo stub de load test.",
+                    "type": "stub_error",
+                    "code": str(config.error_status)
+                }}
+            )
+
+        content = json.dumps(STUB_ANALYSIS, ensure_ascii=False)
+
+        if body.get("stream"):
+            # Parte da latência vai para o primeiro token, o resto é distribuído entre os chunks
+            await asyncio.sleep(latency / 2)
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                _stream_events(
+                    config, model, content,
+                    chunk_delay=latency / 2 / max(1, config.stream_chunks),
+                    include_usage=include_usage
+                ),
+                media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(latency)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": _usage(config, 120)
+        }
+
+    return app
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Argumentos de comportamento do stub (compartilhados com loadtest.run).
+    """
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Mediana da latência (ms)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Sigma da log-normal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas com erro")
+    parser.add_argument("--error-status", type=int, default=429, help="Status HTTP dos erros simulados")
+    parser.add_argument("--stream-chunks", type=int, default=20, help="Chunks por resposta em streaming")
+    parser.add_argument("--cached-tokens", type=int, default=0, help="cached_tokens reportados no usage")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_median_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_chunks=args.stream_chunks,
+        cached_tokens=args.cached_tokens,
+        seed=args.seed
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub local da API de chat completions da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_stub_app(stub_config_from_args(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
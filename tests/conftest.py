@@ -0,0 +1,38 @@
+import os
+
+# Settings exige a chave já no import de app.config
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import pytest
+
+from app import analyzer as analyzer_module
+
+
+@pytest.fixture
+def llm_result():
+    """
+    LLMAnalysisResult canônico (dict) usado como resposta falsa do LLM.
+    """
+    return {
+        "resumo_executivo": "Resumo",
+        "objetivo_do_cliente": "Objetivo",
+        "principais_dores": ["Dor"],
+        "tecnologias_mencionadas": [],
+        "confianca_geral": 0.9
+    }
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, llm_result):
+    """
+    Substitui a chamada primária ao LLM pelo llm_result.
+    Retorna a lista de kwargs de cada chamada.
+    """
+    calls = []
+
+    def fake_run_llm_analysis(**kwargs):
+        calls.append(kwargs)
+        return dict(llm_result)
+
+    monkeypatch.setattr(analyzer_module, "run_llm_analysis", fake_run_llm_analysis)
+    return calls
@@ -0,0 +1,75 @@
+import json
+import logging
+import queue
+
+from app.analyzer import DemandAnalyzer
+from app.logging_config import (
+    DeferredQueueHandler,
+    InfoSamplingFilter,
+    JsonFormatter,
+    RequestContextFilter,
+    _route_to_root,
+    bind_request_context,
+    get_request_context,
+    reset_request_context
+)
+from app.schemas import DemandInput
+
+
+def _make_record(level=logging.INFO, msg="analyze-demand.start cliente=%s", args=("Cliente X",)):
+    return logging.LogRecord("avivahub-demand-analyzer", level, __file__, 1, msg, args, None)
+
+
+def test_record_is_enqueued_unformatted_with_request_context():
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    token = bind_request_context("req-1")
+    try:
+        handler.handle(_make_record())
+    finally:
+        reset_request_context(token)
+
+    record = log_queue.get_nowait()
+    # Formatação fica para a thread do QueueListener
+    assert record.args == ("Cliente X",)
+    assert record.request_id == "req-1"
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "analyze-demand.start cliente=Cliente X"
+    assert payload["request_id"] == "req-1"
+    assert payload["level"] == "INFO"
+
+
+def test_info_sampling_never_drops_warnings():
+    sampling = InfoSamplingFilter(0.0)
+
+    assert not sampling.filter(_make_record(logging.INFO))
+    assert sampling.filter(_make_record(logging.WARNING))
+    assert InfoSamplingFilter(1.0).filter(_make_record(logging.INFO))
+
+
+def test_analyzer_records_stage_timings(fake_llm):
+    token = bind_request_context("req-2")
+    try:
+        DemandAnalyzer().analyze(DemandInput(cliente="Cliente X", texto_demanda="Bot de WhatsApp"))
+        stages = dict(get_request_context()["stages"])
+    finally:
+        reset_request_context(token)
+
+    assert set(stages) == {"classify", "llm_analysis", "rules", "build_output"}
+    assert all(elapsed >= 0 for elapsed in stages.values())
+
+
+def test_uvicorn_loggers_are_routed_through_root():
+    # Logger descartável: não altera os loggers reais do uvicorn no processo
+    name = "tests.uvicorn-like.access"
+    logger = logging.getLogger(name)
+    logger.addHandler(logging.StreamHandler())
+    logger.propagate = False
+
+    _route_to_root([name])
+
+    assert logger.handlers == []
+    assert logger.propagate
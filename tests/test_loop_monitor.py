@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+from app.loop_monitor import LAG_BUCKETS_MS, EventLoopLagMonitor
+
+
+def test_snapshot_buckets_are_cumulative():
+    monitor = EventLoopLagMonitor(interval_ms=50)
+    for lag_ms in (0.5, 3, 3, 20000):
+        monitor.record(lag_ms)
+
+    snapshot = monitor.snapshot()
+    counts = dict(zip(LAG_BUCKETS_MS, snapshot["contagens"]))
+
+    assert snapshot["amostras"] == 4
+    assert counts[1] == 1
+    assert counts[5] == 2
+    assert snapshot["contagens"][-1] == 1
+    assert snapshot["max_ms"] == 20000
+
+
+def test_monitor_detects_blocked_loop():
+    async def scenario():
+        monitor = EventLoopLagMonitor(interval_ms=10)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.2)  # bloqueia o loop, como um handler síncrono
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+        return monitor.snapshot()
+
+    assert asyncio.run(scenario())["max_ms"] >= 150
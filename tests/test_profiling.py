@@ -0,0 +1,81 @@
+import pstats
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.config import settings
+from app.profiling import is_valid_profile_id
+
+
+PAYLOAD = {"cliente": "Cliente X", "texto_demanda": "Quero um aplicativo"}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, fake_llm):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "segredo")
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    return TestClient(main.app)
+
+
+def test_privileged_header_profiles_request(client, tmp_path):
+    response = client.post(
+        "/analyze-demand",
+        json=PAYLOAD,
+        headers={"x-request-id": "req-123", "x-profile": "segredo"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["x-profile-id"] == "req-123"
+    pstats.Stats(str(tmp_path / "req-123.prof"))
+
+    download = client.get("/profiles/req-123", headers={"x-profile": "segredo"})
+    assert download.status_code == 200
+    assert download.content == (tmp_path / "req-123.prof").read_bytes()
+
+
+def test_request_is_not_profiled_without_token(client, tmp_path):
+    response = client.post(
+        "/analyze-demand",
+        json=PAYLOAD,
+        headers={"x-request-id": "req-456", "x-profile": "errado"}
+    )
+
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert not any(tmp_path.iterdir())
+    assert client.get("/profiles/req-456", headers={"x-profile": "errado"}).status_code == 404
+
+
+def test_unsafe_request_ids_are_rejected():
+    assert is_valid_profile_id("3f2a-uuid_1.0")
+    assert not is_valid_profile_id("../etc/passwd")
+    assert not is_valid_profile_id("..")
+
+
+def test_existing_profile_is_not_overwritten(client, tmp_path):
+    headers = {"x-request-id": "req-dup", "x-profile": "segredo"}
+    client.post("/analyze-demand", json=PAYLOAD, headers=headers)
+    original = (tmp_path / "req-dup.prof").read_bytes()
+
+    response = client.post("/analyze-demand", json=PAYLOAD, headers=headers)
+
+    assert "x-profile-id" not in response.headers
+    assert (tmp_path / "req-dup.prof").read_bytes() == original
+
+
+def test_profile_retention_keeps_most_recent(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_MAX_FILES", 2)
+
+    for i in range(3):
+        client.post(
+            "/analyze-demand",
+            json=PAYLOAD,
+            headers={"x-request-id": f"req-{i}", "x-profile": "segredo"}
+        )
+        time.sleep(0.01)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["req-1.prof", "req-2.prof"]
@@ -0,0 +1,56 @@
+import hashlib
+
+from langchain_core.messages import AIMessage
+
+from app import llm
+from app.prompt import SYSTEM_PROMPT, USER_PROMPT
+
+
+# Hash do prefixo estático enviado ao provider.
+# Se mudar de propósito, atualize aqui (o cache de prefixo será invalidado).
+STATIC_PREFIX_SHA256 = "8a28c6f65df642e7eda3396f448a493a62fe1b2ca0d72180e7ef570399d6d621"
+
+
+def test_static_prefix_is_byte_identical():
+    prefix = llm.render_static_prefix()
+    assert hashlib.sha256(prefix.encode("utf-8")).hexdigest() == STATIC_PREFIX_SHA256
+
+
+def test_variable_fields_come_after_static_prefix():
+    for campo in ("{cliente}", "{categorias}", "{restricoes}", "{texto_demanda}"):
+        assert campo not in SYSTEM_PROMPT
+        assert campo in USER_PROMPT
+
+    assert "{format_instructions}" not in USER_PROMPT
+    assert [m.__class__.__name__ for m in llm._PROMPT.messages] == [
+        "SystemMessagePromptTemplate",
+        "HumanMessagePromptTemplate"
+    ]
+
+
+def test_cached_tokens_are_recorded():
+    before = llm.get_llm_usage_metrics()
+
+    message = AIMessage(
+        content="{}",
+        usage_metadata={
+            "input_tokens": 1200,
+            "output_tokens": 80,
+            "total_tokens": 1280,
+            "input_token_details": {"cache_read": 1024}
+        }
+    )
+    usage = llm._record_usage(message)
+    after = llm.get_llm_usage_metrics()
+
+    assert usage == {"input_tokens": 1200, "cached_tokens": 1024, "output_tokens": 80}
+    assert after["chamadas"] == before["chamadas"] + 1
+    assert after["cached_tokens"] - before["cached_tokens"] == 1024
+
+
+def test_delta_prompt_shares_static_prefix():
+    delta_prefix = llm._DELTA_PROMPT.messages[0].format(
+        **llm._DELTA_PROMPT.partial_variables
+    ).content
+    assert delta_prefix == llm.render_static_prefix()
+
@@ -0,0 +1,143 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import analyzer as analyzer_module
+from app import main
+from app.schemas import DemandInput
+from app.session import (
+    PLAN_DELTA,
+    PLAN_FULL,
+    PLAN_NONE,
+    PLAN_RULES,
+    AnalysisSession,
+    describe_text_changes
+)
+
+
+TEXTO = (
+    "Cliente quer desenvolver um aplicativo para acompanhar chamados internos "
+    "da equipe de manutenção, com notificações e relatórios mensais de atendimento."
+)
+
+
+@pytest.fixture
+def llm_calls(monkeypatch, llm_result):
+    calls = []
+
+    def fake_full(**kwargs):
+        calls.append(("completo", kwargs))
+        return dict(llm_result)
+
+    def fake_delta(**kwargs):
+        calls.append(("delta", kwargs))
+        return {**llm_result, "tecnologias_mencionadas": ["WhatsApp"]}
+
+    monkeypatch.setattr(analyzer_module, "run_llm_analysis", fake_full)
+    monkeypatch.setattr(analyzer_module, "run_llm_delta_analysis", fake_delta)
+    return calls
+
+
+def _send_edit(ws, payload):
+    ws.send_json(payload)
+    events = []
+    while True:
+        event = ws.receive_json()
+        events.append(event)
+        if event["tipo"] in ("resultado", "erro"):
+            return events
+
+
+def test_session_reruns_only_affected_stages(llm_calls, llm_result):
+    demanda = {"cliente": "Cliente X", "texto_demanda": TEXTO}
+
+    with TestClient(main.app).websocket_connect("/ws/analyze-session") as ws:
+        events = _send_edit(ws, demanda)
+        assert [e["tipo"] for e in events] == ["plano", "regras", "llm", "resultado"]
+        assert events[-1]["plano"] == "completo"
+
+        # Restrição nova: só regras, sem LLM
+        events = _send_edit(ws, {**demanda, "restricoes": ["LGPD"]})
+        assert [e["tipo"] for e in events] == ["plano", "regras", "resultado"]
+        assert events[-1]["plano"] == "regras"
+
+        # Edição pequena no texto: prompt delta
+        texto_editado = TEXTO.replace("com notificações", "com notificações por WhatsApp")
+        events = _send_edit(ws, {**demanda, "texto_demanda": texto_editado, "restricoes": ["LGPD"]})
+        assert events[-1]["plano"] == "delta"
+        assert events[-1]["resultado"]["tecnologias_mencionadas"] == ["WhatsApp"]
+
+        # Texto reescrito: análise completa
+        events = _send_edit(ws, {**demanda, "texto_demanda": "Precisamos de um pentest na rede."})
+        assert events[-1]["plano"] == "completo"
+
+    assert [kind for kind, _ in llm_calls] == ["completo", "delta", "completo"]
+    delta_kwargs = llm_calls[1][1]
+    assert "+ por WhatsApp" in delta_kwargs["alteracoes"]
+    assert delta_kwargs["analise_anterior"] == llm_result
+
+
+def test_session_reports_invalid_input(llm_calls):
+    with TestClient(main.app).websocket_connect("/ws/analyze-session") as ws:
+        events = _send_edit(ws, {"cliente": "Cliente X"})
+
+    assert len(events) == 1
+    assert events[0]["error"] == "invalid_input"
+    assert llm_calls == []
+
+
+def test_session_survives_malformed_json(llm_calls):
+    demanda = {"cliente": "Cliente X", "texto_demanda": TEXTO}
+
+    with TestClient(main.app).websocket_connect("/ws/analyze-session") as ws:
+        _send_edit(ws, demanda)
+
+        ws.send_text("not json")
+        event = ws.receive_json()
+        assert event["tipo"] == "erro"
+        assert event["error"] == "invalid_input"
+
+        # Estado da sessão preservado: a próxima edição não refaz o LLM
+        events = _send_edit(ws, {**demanda, "restricoes": ["LGPD"]})
+        assert events[-1]["plano"] == "regras"
+
+    assert [kind for kind, _ in llm_calls] == ["completo"]
+
+
+def test_whitespace_only_edit_skips_llm(llm_result):
+    session = AnalysisSession(main.analyzer)
+    session.demand = DemandInput(cliente="Cliente X", texto_demanda=TEXTO)
+    session.llm_result = llm_result
+    session.baseline_text = TEXTO
+
+    reflowed = TEXTO.replace(" da equipe", "\n\nda  equipe") + "  "
+    assert session.plan(DemandInput(cliente="Cliente X", texto_demanda=reflowed)) == (PLAN_NONE, "")
+
+    plan, _ = session.plan(DemandInput(cliente="Cliente X", texto_demanda=reflowed, restricoes=["LGPD"]))
+    assert plan == PLAN_RULES
+
+
+def test_chained_deltas_are_measured_against_last_full_analysis(llm_result):
+    base = [f"palavra{i}" for i in range(20)]
+    first_edit = ["nova"] * 4 + base[4:]
+    second_edit = ["nova"] * 8 + base[8:]
+
+    session = AnalysisSession(main.analyzer)
+    session.baseline_text = " ".join(base)
+    session.demand = DemandInput(cliente="Cliente X", texto_demanda=" ".join(first_edit))
+    session.llm_result = llm_result
+
+    # Próxima da edição anterior, mas já longe da base da última análise completa
+    plan, _ = session.plan(DemandInput(cliente="Cliente X", texto_demanda=" ".join(second_edit)))
+    assert plan == PLAN_FULL
+
+    session.baseline_text = " ".join(first_edit)
+    plan, changes = session.plan(DemandInput(cliente="Cliente X", texto_demanda=" ".join(second_edit)))
+    assert plan == PLAN_DELTA
+    assert changes.endswith("- palavra4 palavra5 palavra6 palavra7\n+ nova nova nova nova")
+
+
+def test_describe_text_changes():
+    similarity, changes = describe_text_changes("um app de chamados", "um app web de chamados")
+
+    assert similarity > 0.8
+    assert changes == "~ um app\n+ web"
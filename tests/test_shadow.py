@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app import llm, main, shadow
+from app.config import settings
+
+
+@pytest.fixture
+def llm_result(llm_result):
+    # Resultado primário com listas suficientes para medir concordância
+    return {
+        **llm_result,
+        "principais_dores": ["Chamados em planilhas", "Falta de visibilidade"],
+        "tecnologias_mencionadas": ["AWS"]
+    }
+
+
+@pytest.fixture
+def candidate_gate(monkeypatch, fake_llm, llm_result):
+    gate = threading.Event()
+    candidate = {
+        **llm_result,
+        "principais_dores": ["chamados em  planilhas"],
+        "tecnologias_mencionadas": ["AWS", "WhatsApp"],
+        "confianca_geral": 0.7
+    }
+
+    def fake_candidate(**kwargs):
+        gate.wait(timeout=5)
+        return dict(candidate), {"input_tokens": 900, "cached_tokens": 0, "output_tokens": 100}
+
+    monkeypatch.setattr(shadow, "run_llm_analysis_with_usage", fake_candidate)
+    monkeypatch.setattr(settings, "SHADOW_MODELS", ["modelo-candidato"])
+    monkeypatch.setattr(settings, "SHADOW_SAMPLE_RATE", 1.0)
+    shadow._records.clear()
+    yield gate
+    gate.set()
+
+
+def _wait_for_records(count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(shadow.get_records()) >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError("shadow não terminou a tempo")
+
+
+def test_shadow_runs_after_response_and_reports_agreement(candidate_gate):
+    client = TestClient(main.app)
+
+    # O candidato está bloqueado: a resposta primária não pode esperar por ele
+    response = client.post(
+        "/analyze-demand",
+        json={"cliente": "Cliente X", "texto_demanda": "Sistema de chamados na AWS"}
+    )
+    assert response.status_code == 200
+    assert shadow.get_records() == []
+
+    candidate_gate.set()
+    _wait_for_records(1)
+
+    report = client.get("/shadow/report").json()
+    modelo = report["modelos"]["modelo-candidato"]
+
+    assert report["modelos_primarios"] == [settings.LLM_MODEL]
+    assert modelo["amostras"] == 1
+    assert modelo["erros"] == 0
+    assert modelo["tokens_medios"]["output_tokens"] == 100
+    assert modelo["latencia_primaria_ms"]["p50"] is not None
+    assert modelo["concordancia_media"] == {
+        "principais_dores": 0.5,
+        "tecnologias_mencionadas": 0.5,
+        "confianca_delta": -0.2,
+        "confianca_delta_abs": 0.2
+    }
+
+
+def test_shadow_records_candidate_errors(monkeypatch, candidate_gate):
+    def failing_candidate(**kwargs):
+        raise TimeoutError("candidato lento")
+
+    monkeypatch.setattr(shadow, "run_llm_analysis_with_usage", failing_candidate)
+
+    TestClient(main.app).post(
+        "/analyze-demand",
+        json={"cliente": "Cliente X", "texto_demanda": "Sistema de chamados"}
+    )
+    _wait_for_records(1)
+
+    record = shadow.get_records()[0]
+    assert record["ok"] is False
+    assert record["erro"] == "TimeoutError"
+    assert shadow.build_report([record])["modelos"]["modelo-candidato"]["taxa_erro"] == 1.0
+
+
+def test_shadow_calls_do_not_count_in_llm_metrics(monkeypatch, llm_result):
+    message = AIMessage(
+        content=json.dumps(llm_result),
+        usage_metadata={"input_tokens": 900, "output_tokens": 100, "total_tokens": 1000}
+    )
+    monkeypatch.setattr(llm, "_build_llm", lambda model: RunnableLambda(lambda _: message))
+    before = llm.get_llm_usage_metrics()
+
+    _, usage = llm.run_llm_analysis_with_usage(
+        cliente="Cliente X",
+        texto_demanda="Sistema de chamados",
+        categorias=["Sistema"],
+        restricoes=[],
+        model="modelo-candidato",
+        shadow=True
+    )
+
+    assert usage["input_tokens"] == 900
+    assert llm.get_llm_usage_metrics() == before
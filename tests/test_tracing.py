@@ -0,0 +1,126 @@
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app import llm, main, shadow, tracing
+from app.config import settings
+
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tracer_provider():
+    # O TracerProvider global só pode ser registrado uma vez por processo
+    tracing.setup_tracing(_exporter)
+    yield
+
+
+@pytest.fixture
+def upstream(monkeypatch, llm_result):
+    """
+    Upstream falso: responde 429 na primeira tentativa e 200 na segunda.
+    """
+    seen_headers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(dict(request.headers))
+        if len(seen_headers) == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "1"}, json={"error": {"message": "rate"}})
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": settings.LLM_MODEL,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(llm_result)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        })
+
+    client = httpx.Client(transport=tracing.TracingTransport(httpx.MockTransport(handler)))
+    monkeypatch.setattr(llm, "_HTTP_CLIENT", client)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 1)
+    _exporter.clear()
+    return seen_headers
+
+
+def test_shared_http_client_uses_sdk_pool_limits():
+    pool = llm._HTTP_CLIENT._transport._wrapped._pool
+
+    assert pool._max_connections == 1000
+    assert pool._max_keepalive_connections == 100
+
+
+def test_spans_cover_request_stages_and_llm_attempts(upstream):
+    response = TestClient(main.app).post(
+        "/analyze-demand",
+        json={"cliente": "Cliente X", "texto_demanda": "Quero um app na AWS"},
+        headers={"traceparent": TRACEPARENT}
+    )
+    assert response.status_code == 200
+
+    trace.get_tracer_provider().force_flush()
+    spans = _exporter.get_finished_spans()
+    names = [span.name for span in spans]
+
+    # Contexto de entrada é respeitado em todos os spans
+    assert {format(span.context.trace_id, "032x") for span in spans} == {TRACE_ID}
+
+    assert "POST /analyze-demand" in names
+    for stage in ("analyzer.classify", "analyzer.llm_analysis", "analyzer.rules", "analyzer.build_output"):
+        assert stage in names
+    assert "llm.chat" in names
+
+    # Uma tentativa HTTP por chamada ao upstream, inclusive o retry
+    attempts = [span for span in spans if span.name == "llm.http_attempt"]
+    assert [a.attributes["http.response.status_code"] for a in attempts] == [429, 200]
+
+    # trace-context propagado para o upstream e de volta ao chamador
+    assert all(TRACE_ID in headers["traceparent"] for headers in upstream)
+    assert TRACE_ID in response.headers["traceparent"]
+
+
+def test_shadow_spans_join_the_request_trace(monkeypatch, upstream):
+    monkeypatch.setattr(settings, "SHADOW_MODELS", ["modelo-candidato"])
+    monkeypatch.setattr(settings, "SHADOW_SAMPLE_RATE", 1.0)
+    shadow._records.clear()
+
+    response = TestClient(main.app).post(
+        "/analyze-demand",
+        json={"cliente": "Cliente X", "texto_demanda": "Quero um app na AWS"},
+        headers={"traceparent": TRACEPARENT}
+    )
+    assert response.status_code == 200
+
+    deadline = time.monotonic() + 5
+    while not shadow.get_records() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert shadow.get_records()[0]["ok"]
+
+    trace.get_tracer_provider().force_flush()
+    spans = _exporter.get_finished_spans()
+
+    # O shadow não repete as etapas instrumentadas da requisição primária
+    assert [span.name for span in spans].count("analyzer.classify") == 1
+
+    shadow_span = next(span for span in spans if span.name == "shadow.modelo-candidato")
+    assert format(shadow_span.context.trace_id, "032x") == TRACE_ID
+    assert shadow_span.attributes["shadow"] is True
+
+    shadow_llm = [
+        span for span in spans
+        if span.name == "llm.chat" and span.parent.span_id == shadow_span.context.span_id
+    ]
+    assert len(shadow_llm) == 1
+    assert shadow_llm[0].attributes["shadow"] is True